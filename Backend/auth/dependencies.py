@@ -1,8 +1,10 @@
 """
 Shared dependencies for authentication across all routes
 """
-from fastapi import Cookie, HTTPException, Depends, Header
-from typing import Optional
+from fastapi import BackgroundTasks, Cookie, HTTPException, Depends, Header
+from google.oauth2.credentials import Credentials
+from typing import Annotated, Optional
+from auth.router import get_credentials
 
 SESSION_COOKIE_NAME = "session_id"
 
@@ -30,3 +32,19 @@ def require_session(session_id: Optional[str] = Depends(get_session_id)) -> str:
             detail="Not authenticated. Please login first at /auth/login"
         )
     return session_id
+
+
+def require_credentials(
+    background_tasks: BackgroundTasks,
+    session_id: str = Depends(require_session),
+) -> Credentials:
+    """Require valid Google credentials for the session, raise 401 if missing"""
+    credentials = get_credentials(session_id, background_tasks)
+    if not credentials:
+        raise HTTPException(status_code=401, detail="User not authenticated. Visit /auth/login first.")
+    return credentials
+
+
+# Resolved once per request, however many times a handler or dependency asks for them
+SessionId = Annotated[str, Depends(require_session)]
+CurrentCreds = Annotated[Credentials, Depends(require_credentials)]
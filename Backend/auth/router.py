@@ -1,10 +1,15 @@
-from fastapi import APIRouter, HTTPException, Response, Cookie, Header
+from fastapi import APIRouter, HTTPException, Response, Cookie, Header, BackgroundTasks
 from fastapi.responses import RedirectResponse
 from google_auth_oauthlib.flow import Flow
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from google.oauth2.credentials import Credentials
+from cachetools import TTLCache
+from datetime import datetime, timedelta
+import logging
 import os
 import secrets
+import threading
+import weakref
 from typing import Optional
 from config import (
     GOOGLE_CLIENT_ID,
@@ -14,6 +19,11 @@ from config import (
     FRONTEND_URL,
 )
 from database import save_credentials, load_credentials, delete_credentials, get_all_users
+from cache import cache_get, cache_set, cache_delete
+from serialization import loads, ORJSONResponse
+from google_services.service_cache import build_service, invalidate_services
+
+logger = logging.getLogger(__name__)
 
 # Allow scope changes (Google adds 'openid' automatically)
 os.environ["OAUTHLIB_RELAX_TOKEN_SCOPE"] = "1"
@@ -24,6 +34,27 @@ SESSION_COOKIE_NAME = "session_id"
 # Check if we're in production (HTTPS)
 IS_PRODUCTION = os.getenv("VERCEL_ENV") is not None or FRONTEND_URL.startswith("https://")
 
+# OAuth client configuration, built once at import
+_OAUTH_CLIENT_CONFIG = {
+    "web": {
+        "client_id": GOOGLE_CLIENT_ID,
+        "client_secret": GOOGLE_CLIENT_SECRET,
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }
+}
+
+
+def new_flow() -> Flow:
+    """
+    Create an OAuth flow for one login or callback.
+    Flow carries per-request state (OAuth session, PKCE verifier), so it is not shared.
+    """
+    flow = Flow.from_client_config(_OAUTH_CLIENT_CONFIG, scopes=SCOPES)
+    flow.redirect_uri = GOOGLE_REDIRECT_URI
+    return flow
+
+
 def get_cookie_settings():
     """Get cookie settings based on environment for cross-site cookies"""
     return {
@@ -34,8 +65,70 @@ def get_cookie_settings():
         "max_age": 60 * 60 * 24 * 7,  # 7 days
     }
 
-# In-memory cache per session (for serverless, this resets, so we rely on MongoDB)
-credentials_cache = {}
+# Session-specific auth responses must never be cached by the browser or a proxy
+NO_STORE_HEADERS = {"Cache-Control": "no-store"}
+
+# Seconds a session's credentials stay in Redis (matches the access-token lifetime)
+CREDENTIALS_TTL = 60 * 60
+
+# Small per-process cache in front of Redis, short-lived so logouts on other workers take effect
+# (for serverless, this resets, so we rely on Redis and MongoDB)
+credentials_cache = TTLCache(maxsize=128, ttl=60)
+_credentials_cache_lock = threading.Lock()
+
+# The email behind a session never changes, so /auth/status polling needn't hit userinfo
+EMAIL_TTL = 3 * 60 * 60
+email_cache = TTLCache(maxsize=4096, ttl=EMAIL_TTL)
+
+
+# Refresh tokens this long before they expire, and at most once at a time per session
+REFRESH_MARGIN = timedelta(minutes=5)
+# Locks live only as long as some refresh of the session holds them
+_refresh_locks: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+_refresh_locks_guard = threading.Lock()
+
+
+def _session_cache_key(session_id: str) -> str:
+    return f"sess:{session_id}"
+
+
+def _email_cache_key(session_id: str) -> str:
+    return f"email:{session_id}"
+
+
+def cache_credentials(session_id: str, creds: Credentials):
+    """Store credentials in the per-process cache and in Redis"""
+    with _credentials_cache_lock:
+        credentials_cache[session_id] = creds
+    cache_set(_session_cache_key(session_id), creds.to_json(), CREDENTIALS_TTL)
+
+
+def load_cached_credentials(session_id: str) -> Optional[Credentials]:
+    """Load credentials from the per-process cache, then Redis"""
+    with _credentials_cache_lock:
+        creds = credentials_cache.get(session_id)
+    if creds is not None:
+        return creds
+    
+    raw = cache_get(_session_cache_key(session_id))
+    if raw is None:
+        return None
+    try:
+        creds = Credentials.from_authorized_user_info(loads(raw))
+    except ValueError as e:
+        logger.warning("Error decoding cached credentials: %s", e)
+        return None
+    with _credentials_cache_lock:
+        credentials_cache[session_id] = creds
+    return creds
+
+
+def forget_credentials(session_id: str):
+    """Remove credentials (and the cached email) from the per-process cache and Redis"""
+    with _credentials_cache_lock:
+        credentials_cache.pop(session_id, None)
+        email_cache.pop(session_id, None)
+    cache_delete(_session_cache_key(session_id), _email_cache_key(session_id))
 
 
 def extract_session_id(
@@ -52,53 +145,108 @@ def extract_session_id(
     return session_cookie
 
 
-def get_user_email_from_credentials(credentials):
-    """Get the user's email from Google using credentials"""
+def get_user_email_from_credentials(credentials, session_id: Optional[str] = None):
+    """Get the user's email from Google using credentials (cached per session)"""
+    if session_id:
+        with _credentials_cache_lock:
+            user_email = email_cache.get(session_id)
+        if user_email is None:
+            raw = cache_get(_email_cache_key(session_id))
+            user_email = raw.decode() if raw is not None else None
+        if user_email is not None:
+            with _credentials_cache_lock:
+                email_cache[session_id] = user_email
+            return user_email
+    
     try:
-        service = build('oauth2', 'v2', credentials=credentials)
+        service = build_service('oauth2', 'v2', credentials)
         user_info = service.userinfo().get().execute()
-        return user_info.get('email')
+        user_email = user_info.get('email')
+        if session_id and user_email:
+            with _credentials_cache_lock:
+                email_cache[session_id] = user_email
+            cache_set(_email_cache_key(session_id), user_email, EMAIL_TTL)
+        return user_email
     except Exception as e:
-        print(f"Error getting user email: {e}")
+        logger.warning("Error getting user email: %s", e)
         return None
 
 
-def get_credentials(session_id: Optional[str] = None):
-    """Get credentials for a specific session/user"""
+def _expires_soon(creds: Credentials) -> bool:
+    """Whether the access token expires within the refresh margin"""
+    return creds.expiry is not None and creds.expiry - REFRESH_MARGIN <= datetime.utcnow()
+
+
+def _refresh_lock(session_id: str) -> threading.Lock:
+    with _refresh_locks_guard:
+        lock = _refresh_locks.get(session_id)
+        if lock is None:
+            lock = threading.Lock()
+            _refresh_locks[session_id] = lock
+        return lock
+
+
+def refresh_credentials(session_id: str, creds: Credentials) -> Optional[Credentials]:
+    """Refresh a session's token; concurrent callers wait for a single refresh"""
+    with _refresh_lock(session_id):
+        # Another request may have refreshed the session while we waited
+        cached = load_cached_credentials(session_id)
+        if cached is not None and not _expires_soon(cached):
+            return cached
+        try:
+            creds.refresh(Request())
+        except Exception as e:
+            logger.warning("Error refreshing token: %s", e)
+            # Token refresh failed, remove from cache
+            forget_credentials(session_id)
+            return None
+        cache_credentials(session_id, creds)
+        return creds
+
+
+def refresh_and_save_credentials(session_id: str, creds: Credentials) -> Optional[Credentials]:
+    """Refresh a session's token (see refresh_credentials) and persist it to MongoDB"""
+    refreshed = refresh_credentials(session_id, creds)
+    if refreshed is not None:
+        save_credentials(refreshed, session_id)
+    return refreshed
+
+
+def get_credentials(session_id: Optional[str] = None, background_tasks: Optional[BackgroundTasks] = None):
+    """
+    Get credentials for a specific session/user.
+    With background_tasks, tokens close to expiry are refreshed after the response
+    is sent and refreshed credentials are persisted to MongoDB in the background.
+    """
     if not session_id:
         return None
     
-    # Check memory cache first
-    if session_id in credentials_cache:
-        creds = credentials_cache[session_id]
-        # Refresh if expired
-        if creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-                save_credentials(creds, session_id)
-                credentials_cache[session_id] = creds
-            except Exception as e:
-                print(f"Error refreshing token: {e}")
-                # Token refresh failed, remove from cache
-                del credentials_cache[session_id]
-                return None
+    # Check memory/Redis cache first, then fall back to the database
+    creds = load_cached_credentials(session_id)
+    if creds is None:
+        # Try loading from database using session_id as user identifier
+        creds = load_credentials(session_id)
+        if creds is None:
+            return None
+        cache_credentials(session_id, creds)
+    
+    if not creds.refresh_token or not _expires_soon(creds):
         return creds
     
-    # Try loading from database using session_id as user identifier
-    creds = load_credentials(session_id)
-    if creds:
-        # Refresh if expired
-        if creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-                save_credentials(creds, session_id)
-            except Exception as e:
-                print(f"Error refreshing token: {e}")
-                return None
-        credentials_cache[session_id] = creds
+    # Token still usable: refresh it pre-emptively once the response is sent
+    if background_tasks is not None and not creds.expired:
+        background_tasks.add_task(refresh_and_save_credentials, session_id, creds)
         return creds
     
-    return None
+    # Refresh if expired
+    creds = refresh_credentials(session_id, creds)
+    if creds is None:
+        return None
+    if background_tasks is not None:
+        background_tasks.add_task(save_credentials, creds, session_id)
+    else:
+        save_credentials(creds, session_id)
+    return creds
 
 
 router = APIRouter()
@@ -118,12 +266,17 @@ def login(
     - If redirect=False: Returns the auth URL as JSON
     - If force=True: Forces re-authentication even if already logged in
     """
-    # Check if already authenticated for this session
+    # Check if already authenticated for this session; a warm cache skips the database
     if not force and session_id:
-        creds = get_credentials(session_id)
+        creds = load_cached_credentials(session_id)
+        if creds is None or creds.expired:
+            creds = get_credentials(session_id)
         if creds and not creds.expired:
             if redirect:
-                redirect_response = RedirectResponse(url=f"{FRONTEND_URL}?authenticated=true")
+                redirect_response = RedirectResponse(
+                    url=f"{FRONTEND_URL}?authenticated=true",
+                    headers=NO_STORE_HEADERS,
+                )
                 # Refresh the cookie with proper settings
                 cookie_settings = get_cookie_settings()
                 redirect_response.set_cookie(
@@ -132,29 +285,17 @@ def login(
                     **cookie_settings
                 )
                 return redirect_response
-            return {
+            return ORJSONResponse({
                 "message": "Already authenticated!",
                 "authenticated": True,
                 "session_id": session_id,
                 "hint": "Use /auth/login?force=true to re-authenticate"
-            }
+            }, headers=NO_STORE_HEADERS)
     
     # Generate a new state parameter that includes a new session ID
     new_session_id = secrets.token_urlsafe(32)
     
-    flow = Flow.from_client_config(
-        {
-            "web": {
-                "client_id": GOOGLE_CLIENT_ID,
-                "client_secret": GOOGLE_CLIENT_SECRET,
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token",
-            }
-        },
-        scopes=SCOPES,
-    )
-
-    flow.redirect_uri = GOOGLE_REDIRECT_URI
+    flow = new_flow()
 
     # Use state parameter to pass session ID through OAuth flow
     auth_url, state = flow.authorization_url(
@@ -179,25 +320,13 @@ def callback(code: str, state: str, response: Response):
     try:
         session_id = state  # Session ID passed through OAuth state
         
-        flow = Flow.from_client_config(
-            {
-                "web": {
-                    "client_id": GOOGLE_CLIENT_ID,
-                    "client_secret": GOOGLE_CLIENT_SECRET,
-                    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token",
-                }
-            },
-            scopes=SCOPES,
-        )
-
-        flow.redirect_uri = GOOGLE_REDIRECT_URI
+        flow = new_flow()
         flow.fetch_token(code=code)
 
         credentials = flow.credentials
         
-        # Store in memory cache with session ID
-        credentials_cache[session_id] = credentials
+        # Store in memory/Redis cache with session ID
+        cache_credentials(session_id, credentials)
         
         # Persist to MongoDB database with session ID as key
         save_credentials(credentials, session_id)
@@ -217,24 +346,21 @@ def callback(code: str, state: str, response: Response):
         return redirect_response
         
     except Exception as e:
-        print(f"❌ OAuth callback error: {e}")
-        raise HTTPException(status_code=500, detail=f"OAuth callback failed: {str(e)}")
-        
-    except Exception as e:
-        print(f"❌ OAuth callback error: {e}")
+        logger.exception("OAuth callback error")
         raise HTTPException(status_code=500, detail=f"OAuth callback failed: {str(e)}")
 
 
 @router.get("/success")
 def auth_success(
+    background_tasks: BackgroundTasks,
     session_cookie: Optional[str] = Cookie(None, alias=SESSION_COOKIE_NAME),
     authorization: Optional[str] = Header(None)
 ):
     """Success page after authentication"""
     session_id = extract_session_id(session_cookie, authorization)
-    creds = get_credentials(session_id)
+    creds = get_credentials(session_id, background_tasks)
     if creds:
-        user_email = get_user_email_from_credentials(creds)
+        user_email = get_user_email_from_credentials(creds, session_id)
         return {
             "message": "✅ Authentication successful!",
             "status": "logged_in",
@@ -247,14 +373,15 @@ def auth_success(
 
 @router.get("/status")
 def auth_status(
+    background_tasks: BackgroundTasks,
     session_cookie: Optional[str] = Cookie(None, alias=SESSION_COOKIE_NAME),
     authorization: Optional[str] = Header(None)
 ):
     """Check if user is authenticated"""
     session_id = extract_session_id(session_cookie, authorization)
-    creds = get_credentials(session_id)
+    creds = get_credentials(session_id, background_tasks)
     if creds:
-        user_email = get_user_email_from_credentials(creds)
+        user_email = get_user_email_from_credentials(creds, session_id)
         return {
             "authenticated": True,
             "expired": creds.expired,
@@ -273,9 +400,9 @@ def logout(
     """Clear stored credentials for current user session"""
     session_id = extract_session_id(session_cookie, authorization)
     if session_id:
-        # Remove from memory cache
-        if session_id in credentials_cache:
-            del credentials_cache[session_id]
+        # Remove from memory/Redis cache
+        forget_credentials(session_id)
+        invalidate_services(session_id)
         # Remove from database
         delete_credentials(session_id)
     
@@ -317,7 +444,7 @@ def set_session(response: Response, session_id: str):
         **cookie_settings
     )
     
-    user_email = get_user_email_from_credentials(creds)
+    user_email = get_user_email_from_credentials(creds, session_id)
     return {
         "message": "Session cookie set successfully",
         "authenticated": True,
@@ -0,0 +1,92 @@
+"""
+Cache module for shared, TTL-bounded session data
+Uses Redis when REDIS_URL is configured (shared across workers/serverless replicas)
+Every operation degrades to a cache miss if Redis is unavailable
+"""
+import logging
+import os
+from typing import Optional
+import redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Global client (connection pooling)
+_client = None
+
+
+def get_redis() -> Optional[redis.Redis]:
+    """Get Redis client with connection pooling, or None if Redis is not configured"""
+    global _client
+
+    if _client is not None or not REDIS_URL:
+        return _client
+
+    _client = redis.Redis.from_url(
+        REDIS_URL,
+        max_connections=20,
+        socket_connect_timeout=2,
+        socket_timeout=2,
+    )
+    return _client
+
+
+def cache_get(key: str) -> Optional[bytes]:
+    """Get a cached value, or None on miss"""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return client.get(key)
+    except redis.RedisError as e:
+        logger.warning("Redis get failed: %s", e)
+        return None
+
+
+def cache_set(key: str, value, ttl: int):
+    """Set a cached value with a TTL in seconds"""
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.setex(key, ttl, value)
+    except redis.RedisError as e:
+        logger.warning("Redis set failed: %s", e)
+
+
+def cache_delete(*keys: str):
+    """Delete cached values"""
+    client = get_redis()
+    if client is None or not keys:
+        return
+    try:
+        client.delete(*keys)
+    except redis.RedisError as e:
+        logger.warning("Redis delete failed: %s", e)
+
+
+def cache_hget(key: str, field: str) -> Optional[bytes]:
+    """Get a field of a cached hash, or None on miss"""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return client.hget(key, field)
+    except redis.RedisError as e:
+        logger.warning("Redis hget failed: %s", e)
+        return None
+
+
+def cache_hset(key: str, field: str, value, ttl: int):
+    """Set a field of a cached hash and (re)set the TTL of the whole hash"""
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline()
+        pipe.hset(key, field, value)
+        pipe.expire(key, ttl)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Redis hset failed: %s", e)
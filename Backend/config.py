@@ -18,8 +18,8 @@ FRONTEND_URL = os.getenv("FRONTEND_URL", "https://eventx-frontend-murex.vercel.a
 
 GOOGLE_REDIRECT_URI = f"{BACKEND_URL}/auth/callback"
 
-# Google API Scopes - All products
-SCOPES = [
+# Google API Scopes - All products (immutable)
+SCOPES = (
     # Calendar & Meet
     "https://www.googleapis.com/auth/calendar",
     "https://www.googleapis.com/auth/calendar.events",
@@ -55,4 +55,4 @@ SCOPES = [
     # User Profile
     "https://www.googleapis.com/auth/userinfo.profile",
     "https://www.googleapis.com/auth/userinfo.email",
-]
+)
@@ -1,9 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
 from typing import Optional, List
-from auth.router import get_credentials
-from auth.dependencies import require_session
-from google_services.calendar_service import list_events, create_meet_event, create_event, delete_event
+import httpx
+from google.auth.exceptions import RefreshError
+from auth.dependencies import CurrentCreds, SessionId
+from google_services.concurrency import run_for_user, run_async_for_user
+from google_services.calendar_service import (
+    list_events_async,
+    create_meet_event_async,
+    create_meet_events,
+    create_event,
+    delete_event,
+)
 
 router = APIRouter(prefix="/calendar", tags=["Calendar"])
 
@@ -23,22 +31,34 @@ class CreateMeetRequest(BaseModel):
     duration_minutes: Optional[int] = 60  # Duration in minutes (default: 60)
 
 
+class CreateMeetBatchRequest(BaseModel):
+    meetings: List[CreateMeetRequest] = Field(..., min_length=1, max_length=50)
+
+
+def _rest_error(e: Exception) -> HTTPException:
+    """Map a failed direct Calendar call to the response the client should get"""
+    if isinstance(e, RefreshError):
+        return HTTPException(status_code=401, detail="Session expired. Visit /auth/login again.")
+    if isinstance(e, httpx.HTTPStatusError):
+        return HTTPException(status_code=e.response.status_code, detail=e.response.text)
+    # Timeouts, connection resets, ...
+    return HTTPException(status_code=502, detail=f"Google Calendar unreachable: {e}")
+
+
 @router.get("/events")
-def get_events(session_id: str = Depends(require_session)):
-    credentials = get_credentials(session_id)
-    if not credentials:
-        raise HTTPException(status_code=401, detail="User not authenticated")
-    return list_events(credentials)
+async def get_events(credentials: CurrentCreds, session_id: SessionId):
+    try:
+        return await run_async_for_user(session_id, list_events_async, credentials, session_id=session_id)
+    except (httpx.HTTPError, RefreshError) as e:
+        raise _rest_error(e)
 
 
 @router.post("/events")
-def create_calendar_event(request: CreateEventRequest, session_id: str = Depends(require_session)):
+async def create_calendar_event(request: CreateEventRequest, credentials: CurrentCreds, session_id: SessionId):
     """Create a new calendar event"""
-    credentials = get_credentials(session_id)
-    if not credentials:
-        raise HTTPException(status_code=401, detail="User not authenticated")
-    
-    return create_event(
+    return await run_for_user(
+        session_id,
+        create_event,
         credentials=credentials,
         summary=request.summary,
         start_datetime=request.start_datetime,
@@ -46,27 +66,42 @@ def create_calendar_event(request: CreateEventRequest, session_id: str = Depends
         description=request.description,
         location=request.location,
         attendees=request.attendees,
-        timezone=request.timezone or "IST"
+        timezone=request.timezone or "IST",
+        session_id=session_id,
     )
 
 
 @router.post("/meet")
-def create_meet(request: CreateMeetRequest, session_id: str = Depends(require_session)):
+async def create_meet(request: CreateMeetRequest, credentials: CurrentCreds, session_id: SessionId):
     """Create a Google Meet event with a custom name"""
-    credentials = get_credentials(session_id)
-    if not credentials:
-        raise HTTPException(status_code=401, detail="User not authenticated")
-    return {"meet_link": create_meet_event(credentials, summary=request.summary, duration_minutes=request.duration_minutes or 60)}
+    try:
+        meet_link = await run_async_for_user(
+            session_id,
+            create_meet_event_async,
+            credentials,
+            summary=request.summary,
+            duration_minutes=request.duration_minutes or 60,
+            session_id=session_id,
+        )
+    except (httpx.HTTPError, RefreshError) as e:
+        raise _rest_error(e)
+    return {"meet_link": meet_link}
+
+
+@router.post("/meet/batch")
+async def create_meets(request: CreateMeetBatchRequest, credentials: CurrentCreds, session_id: SessionId):
+    """Create several Google Meet events in one batch request"""
+    meetings = [
+        {"summary": m.summary, "duration_minutes": m.duration_minutes or 60}
+        for m in request.meetings
+    ]
+    return await run_for_user(session_id, create_meet_events, credentials, meetings, session_id=session_id)
 
 
 @router.delete("/events/{event_id}")
-def delete_calendar_event(event_id: str, session_id: str = Depends(require_session)):
+async def delete_calendar_event(event_id: str, credentials: CurrentCreds, session_id: SessionId):
     """Delete a calendar event by ID"""
-    credentials = get_credentials(session_id)
-    if not credentials:
-        raise HTTPException(status_code=401, detail="User not authenticated")
-    
     try:
-        return delete_event(credentials, event_id)
+        return await run_for_user(session_id, delete_event, credentials, event_id, session_id=session_id)
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Event not found or could not be deleted: {str(e)}")
@@ -1,36 +1,122 @@
-from googleapiclient.discovery import build
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from datetime import datetime, timedelta
-from typing import Optional, List
-import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Optional, List, Dict, Any, Tuple
+from secrets import token_hex
+import asyncio
+import os
+import httpx
+from google_services.service_cache import get_service
+from google_services.response_cache import cached_response, cached_response_async, invalidate_responses
+from google_services.concurrency import run_blocking, send_with_backoff
+from auth.router import refresh_and_save_credentials
+from serialization import loads
 
+# UTC timestamps for the API (whole seconds are enough)
+RFC3339_UTC = "%Y-%m-%dT%H:%M:%SZ"
 
-def get_calendar_service(credentials: Credentials):
-    """Create Google Calendar service instance"""
-    return build("calendar", "v3", credentials=credentials)
+# Partial response: only the event fields clients display (skips attendees, attachments, ...)
+EVENT_LIST_FIELDS = "items(id, summary, description, location, start, end, status, htmlLink, hangoutLink)"
 
+# Upcoming events are cached per session in Redis (shared by every worker); UIs
+# re-list on every render, writes invalidate the session's entries
+EVENTS_CACHE_TTL = int(os.getenv("CALENDAR_EVENTS_CACHE_TTL", "30"))
 
-def list_events(credentials: Credentials):
-    """List upcoming calendar events for the current month"""
-    service = get_calendar_service(credentials)
-    
+# Max requests per batch call (Calendar allows up to 50)
+BATCH_SIZE = 50
+
+# Direct REST client for the hot endpoints (no discovery layer, no worker thread)
+_client = httpx.AsyncClient(
+    base_url="https://www.googleapis.com/calendar/v3",
+    http2=True,
+    timeout=httpx.Timeout(10.0, connect=3.0),
+)
+
+
+def get_calendar_service(credentials: Credentials, session_id: Optional[str] = None):
+    """Get Google Calendar service instance (reused per session)"""
+    return get_service("calendar", "v3", credentials, session_id)
+
+
+def _upcoming_events_params() -> Dict[str, Any]:
+    """Query for the upcoming events of the current and next month"""
     # Get events starting from now
-    now = datetime.utcnow()
-    now_iso = now.isoformat() + "Z"
+    now = datetime.now(dt_timezone.utc)
+    now_iso = now.strftime(RFC3339_UTC)
     
     # Get events until end of current month + next month (approx 60 days)
     end_date = now + timedelta(days=60)
-    end_iso = end_date.isoformat() + "Z"
+    end_iso = end_date.strftime(RFC3339_UTC)
 
-    events = service.events().list(
-        calendarId="primary",
-        timeMin=now_iso,
-        timeMax=end_iso,
-        maxResults=250,  # Increased to get all month events
-        singleEvents=True,
-        orderBy="startTime",
-    ).execute()
+    return {
+        "timeMin": now_iso,
+        "timeMax": end_iso,
+        "maxResults": 250,  # Increased to get all month events
+        "singleEvents": True,
+        "orderBy": "startTime",
+        "fields": EVENT_LIST_FIELDS,
+    }
+
+
+def invalidate_events(session_id: str):
+    """Drop a session's cached event lists (after a calendar write)"""
+    invalidate_responses("events", session_id)
+
+
+@cached_response("events", ttl=EVENTS_CACHE_TTL, field=lambda credentials: "upcoming")
+def list_events(credentials: Credentials, session_id: Optional[str] = None):
+    """List upcoming calendar events for the current month"""
+    service = get_calendar_service(credentials, session_id)
+    events = service.events().list(calendarId="primary", **_upcoming_events_params()).execute()
+    return events.get("items", [])
 
+
+async def _refreshed_credentials(credentials: Credentials, session_id: Optional[str]) -> Credentials:
+    """
+    Refresh a token Google rejected. Sessions go through the per-session refresh
+    lock and get the new token saved to Redis and MongoDB; raises RefreshError
+    if the token can't be refreshed.
+    """
+    if not session_id:
+        await run_blocking(credentials.refresh, Request())
+        return credentials
+    refreshed = await run_blocking(refresh_and_save_credentials, session_id, credentials)
+    if refreshed is None:
+        raise RefreshError("Token refresh failed")
+    return refreshed
+
+
+async def _calendar_request(
+    credentials: Credentials,
+    session_id: Optional[str],
+    method: str,
+    path: str,
+    **kwargs,
+) -> dict:
+    """
+    Authorized Calendar REST call. Rate limits and transient errors are retried
+    with backoff; a rejected token is refreshed and the call retried once.
+    """
+    # A 5xx on an insert may still have created the event, so only reads retry those
+    should_retry = None if method == "GET" else (lambda response: response.status_code == 429)
+    for attempt in range(2):
+        response = await send_with_backoff(lambda: _client.request(
+            method, path, headers={"Authorization": f"Bearer {credentials.token}"}, **kwargs
+        ), should_retry)
+        if response.status_code != 401 or attempt or not credentials.refresh_token:
+            break
+        credentials = await _refreshed_credentials(credentials, session_id)
+    response.raise_for_status()
+    return loads(response.content)
+
+
+@cached_response_async("events", ttl=EVENTS_CACHE_TTL, field=lambda credentials: "upcoming")
+async def list_events_async(credentials: Credentials, session_id: Optional[str] = None):
+    """List upcoming calendar events for the current month (direct REST call)"""
+    events = await _calendar_request(
+        credentials, session_id, "GET", "/calendars/primary/events", params=_upcoming_events_params()
+    )
     return events.get("items", [])
 
 
@@ -42,7 +128,8 @@ def create_event(
     description: Optional[str] = None,
     location: Optional[str] = None,
     attendees: Optional[List[str]] = None,
-    timezone: str = "IST"
+    timezone: str = "IST",
+    session_id: Optional[str] = None,
 ):
     """Create a calendar event
     
@@ -59,7 +146,7 @@ def create_event(
     Returns:
         Created event details
     """
-    service = get_calendar_service(credentials)
+    service = get_calendar_service(credentials, session_id)
 
     event = {
         "summary": summary,
@@ -81,6 +168,8 @@ def create_event(
         body=event,
         sendUpdates="all" if attendees else "none",
     ).execute()
+    if session_id:
+        invalidate_events(session_id)
 
     return {
         "id": created_event.get("id"),
@@ -94,7 +183,80 @@ def create_event(
     }
 
 
-def create_meet_event(credentials: Credentials, summary: str, duration_minutes: int = 60):
+def _meet_event_body(summary: str, duration_minutes: int, now: datetime) -> dict:
+    """Event starting 1 hour from now with a Google Meet conference request"""
+    start_time = now + timedelta(hours=1)
+    end_time = start_time + timedelta(minutes=duration_minutes)
+
+    return {
+        "summary": summary,
+        "start": {"dateTime": start_time.strftime(RFC3339_UTC), "timeZone": "UTC"},
+        "end": {"dateTime": end_time.strftime(RFC3339_UTC), "timeZone": "UTC"},
+        "conferenceData": {
+            "createRequest": {"requestId": token_hex(16)}
+        },
+    }
+
+
+def _insert_meet_events(
+    credentials: Credentials,
+    meetings: List[Dict[str, Any]],
+    session_id: Optional[str] = None,
+) -> List[Tuple[Optional[dict], Optional[Exception]]]:
+    """Insert Meet events in batch requests; returns (event, error) per meeting, in order"""
+    service = get_calendar_service(credentials, session_id)
+    results = [(None, None)] * len(meetings)
+    now = datetime.now(dt_timezone.utc)
+
+    def on_response(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+
+    for start in range(0, len(meetings), BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=on_response)
+        for i in range(start, min(start + BATCH_SIZE, len(meetings))):
+            meeting = meetings[i]
+            batch.add(
+                service.events().insert(
+                    calendarId="primary",
+                    body=_meet_event_body(meeting["summary"], meeting.get("duration_minutes", 60), now),
+                    conferenceDataVersion=1,
+                ),
+                request_id=str(i),
+            )
+        batch.execute()
+
+    if session_id:
+        invalidate_events(session_id)
+    return results
+
+
+def create_meet_events(credentials: Credentials, meetings: List[Dict[str, Any]], session_id: Optional[str] = None):
+    """Create several calendar events with Google Meet links using batch requests
+    
+    Args:
+        credentials: Google OAuth credentials
+        meetings: Dicts with "summary" and optional "duration_minutes" (default: 60)
+    
+    Returns:
+        Meet links in the same order as the meetings (None for failed ones) and the failures
+    """
+    meet_links = []
+    failed = []
+    for i, (event, error) in enumerate(_insert_meet_events(credentials, meetings, session_id)):
+        if error is not None:
+            failed.append({"index": i, "summary": meetings[i]["summary"], "error": str(error)})
+            meet_links.append(None)
+        else:
+            meet_links.append(event.get("hangoutLink", "No Meet link generated"))
+    return {"meet_links": meet_links, "failed": failed}
+
+
+def create_meet_event(
+    credentials: Credentials,
+    summary: str,
+    duration_minutes: int = 60,
+    session_id: Optional[str] = None,
+):
     """Create a calendar event with Google Meet link
     
     Args:
@@ -102,31 +264,37 @@ def create_meet_event(credentials: Credentials, summary: str, duration_minutes:
         summary: Name/title of the Google Meet meeting
         duration_minutes: Duration of the meeting in minutes (default: 60)
     """
-    service = get_calendar_service(credentials)
+    [(event, error)] = _insert_meet_events(
+        credentials, [{"summary": summary, "duration_minutes": duration_minutes}], session_id
+    )
+    if error is not None:
+        raise error
 
-    # Create event starting 1 hour from now
-    start_time = datetime.utcnow() + timedelta(hours=1)
-    end_time = start_time + timedelta(minutes=duration_minutes)
+    return event.get("hangoutLink", "No Meet link generated")
 
-    event = {
-        "summary": summary,
-        "start": {"dateTime": start_time.isoformat() + "Z", "timeZone": "UTC"},
-        "end": {"dateTime": end_time.isoformat() + "Z", "timeZone": "UTC"},
-        "conferenceData": {
-            "createRequest": {"requestId": str(uuid.uuid4())}
-        },
-    }
 
-    event = service.events().insert(
-        calendarId="primary",
-        body=event,
-        conferenceDataVersion=1,
-    ).execute()
+async def create_meet_event_async(
+    credentials: Credentials,
+    summary: str,
+    duration_minutes: int = 60,
+    session_id: Optional[str] = None,
+):
+    """Create a calendar event with Google Meet link (direct REST call)"""
+    event = await _calendar_request(
+        credentials,
+        session_id,
+        "POST",
+        "/calendars/primary/events",
+        params={"conferenceDataVersion": 1},
+        json=_meet_event_body(summary, duration_minutes, datetime.now(dt_timezone.utc)),
+    )
+    if session_id:
+        await asyncio.to_thread(invalidate_events, session_id)
 
     return event.get("hangoutLink", "No Meet link generated")
 
 
-def delete_event(credentials: Credentials, event_id: str):
+def delete_event(credentials: Credentials, event_id: str, session_id: Optional[str] = None):
     """Delete a calendar event
     
     Args:
@@ -136,12 +304,19 @@ def delete_event(credentials: Credentials, event_id: str):
     Returns:
         Success message
     """
-    service = get_calendar_service(credentials)
+    service = get_calendar_service(credentials, session_id)
     
     service.events().delete(
         calendarId="primary",
         eventId=event_id,
         sendUpdates="all"
     ).execute()
+    if session_id:
+        invalidate_events(session_id)
     
     return {"message": "Event deleted successfully", "event_id": event_id}
+
+
+async def close_calendar_client():
+    """Close pooled Calendar connections (on application shutdown)"""
+    await _client.aclose()
@@ -0,0 +1,147 @@
+"""
+Per-user concurrency limits for Google API calls
+Bounds in-flight calls per session and backs the whole session off when Google rate-limits it
+"""
+import asyncio
+import contextvars
+import functools
+import random
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Mapping, Optional
+import httpx
+from cachetools import TTLCache
+from googleapiclient.errors import HttpError
+
+# Worker threads for blocking Google API calls. The default asyncio executor has
+# min(32, cpus + 4) threads - as few as 5 on small serverless instances
+MAX_WORKERS = 32
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="google-api")
+
+# In-flight Google calls allowed per session (sliding window - a slot frees as soon as a call ends)
+MAX_CONCURRENT_CALLS_PER_USER = 5
+
+# Attempts per call when rate-limited, and the back-off before the first retry (doubles each time)
+MAX_ATTEMPTS = 3
+BASE_COOLDOWN_SECONDS = 1.0
+# Longest rate-limit cooldown waited out inside a request; a longer Retry-After fails the call instead
+MAX_COOLDOWN_SECONDS = 5.0
+
+# Direct REST calls: transient statuses worth retrying, with capped exponential backoff and full jitter
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+HTTP_MAX_ATTEMPTS = 4
+HTTP_BACKOFF_BASE_SECONDS = 0.2
+HTTP_BACKOFF_MAX_SECONDS = 5.0
+
+# Semaphores live only as long as some call of the session holds them
+_user_semaphores: "weakref.WeakValueDictionary[str, asyncio.Semaphore]" = weakref.WeakValueDictionary()
+# session_id -> time.monotonic() before which no new call may start
+_user_cooldown_until = TTLCache(maxsize=4096, ttl=60)
+
+
+def is_rate_limited(error: HttpError) -> bool:
+    """Whether Google rejected the call for exceeding a rate or concurrency quota"""
+    status = error.resp.status
+    return status == 429 or (status == 403 and b"ratelimitexceeded" in (error.content or b"").lower())
+
+
+def _retry_after_seconds(headers: Mapping[str, str], cap: float) -> Optional[float]:
+    """Retry-After in seconds (delta-seconds form), at most cap; None if absent or unparsable"""
+    retry_after = headers.get("retry-after") or ""
+    return min(float(retry_after), cap) if retry_after.isdigit() else None
+
+
+def _cooldown_seconds(headers: Mapping[str, str], attempt: int) -> float:
+    retry_after = _retry_after_seconds(headers, MAX_COOLDOWN_SECONDS)
+    return retry_after if retry_after is not None else BASE_COOLDOWN_SECONDS * 2 ** attempt
+
+
+async def run_blocking(func: Callable[..., Any], /, *args, **kwargs) -> Any:
+    """Run a blocking Google API call on the shared worker pool (like asyncio.to_thread)"""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await loop.run_in_executor(_executor, call)
+
+
+def _rate_limit_cooldown(error: Exception, attempt: int) -> Optional[float]:
+    """Seconds the session should back off for, or None if the error isn't a rate limit"""
+    if isinstance(error, HttpError):
+        return _cooldown_seconds(error.resp, attempt) if is_rate_limited(error) else None
+    if isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429:
+        return _cooldown_seconds(error.response.headers, attempt)
+    return None
+
+
+async def _run_limited(session_id: str, call: Callable[[], Awaitable[Any]]) -> Any:
+    semaphore = _user_semaphores.get(session_id)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_CALLS_PER_USER)
+        _user_semaphores[session_id] = semaphore
+
+    for attempt in range(MAX_ATTEMPTS):
+        async with semaphore:
+            delay = _user_cooldown_until.get(session_id, 0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                return await call()
+            except (HttpError, httpx.HTTPStatusError) as e:
+                cooldown = _rate_limit_cooldown(e, attempt)
+                if cooldown is None:
+                    raise
+                cooldown_until = time.monotonic() + cooldown
+                _user_cooldown_until[session_id] = max(cooldown_until, _user_cooldown_until.get(session_id, 0))
+                # Direct REST calls already retried with backoff (send_with_backoff);
+                # Google asking for a long wait fails fast rather than holding the request
+                if (
+                    isinstance(e, httpx.HTTPStatusError)
+                    or attempt == MAX_ATTEMPTS - 1
+                    or cooldown >= MAX_COOLDOWN_SECONDS
+                ):
+                    raise
+
+
+async def run_for_user(session_id: Optional[str], func: Callable[..., Any], /, *args, **kwargs) -> Any:
+    """
+    Run a blocking Google API call in a worker thread, at most
+    MAX_CONCURRENT_CALLS_PER_USER at a time per session. When a call is
+    rate-limited, every call of the session waits out the same cooldown
+    before starting, and the limited call is retried.
+    """
+    if not session_id:
+        return await run_blocking(func, *args, **kwargs)
+    return await _run_limited(session_id, lambda: run_blocking(func, *args, **kwargs))
+
+
+async def run_async_for_user(
+    session_id: Optional[str], func: Callable[..., Awaitable[Any]], /, *args, **kwargs
+) -> Any:
+    """
+    Await a direct (async) Google API call under the same per-session limit
+    and cooldown as run_for_user. A final 429 starts the session's cooldown
+    but is not retried again here.
+    """
+    if not session_id:
+        return await func(*args, **kwargs)
+    return await _run_limited(session_id, lambda: func(*args, **kwargs))
+
+
+async def send_with_backoff(
+    send: Callable[[], Awaitable[httpx.Response]],
+    should_retry: Optional[Callable[[httpx.Response], bool]] = None,
+) -> httpx.Response:
+    """
+    Send an httpx request, retrying transient failures (429/5xx by default)
+    with exponential backoff and jitter. Retry-After is honoured up to the
+    backoff cap. The last response is returned whether or not it succeeded.
+    """
+    for attempt in range(HTTP_MAX_ATTEMPTS):
+        response = await send()
+        retry = should_retry(response) if should_retry else response.status_code in RETRY_STATUSES
+        if not retry or attempt == HTTP_MAX_ATTEMPTS - 1:
+            return response
+        delay = _retry_after_seconds(response.headers, HTTP_BACKOFF_MAX_SECONDS)
+        if delay is None:
+            delay = min(random.uniform(0, HTTP_BACKOFF_BASE_SECONDS * 2 ** attempt), HTTP_BACKOFF_MAX_SECONDS)
+        await asyncio.sleep(delay)
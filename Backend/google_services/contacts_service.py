@@ -2,13 +2,13 @@
 Google Contacts Service (People API)
 Integrates with People API for contact management
 """
-from googleapiclient.discovery import build
+from google_services.service_cache import build_service
 from typing import Any, Optional
 
 
 def get_people_service(credentials: Any):
     """Create People API service instance"""
-    return build("people", "v1", credentials=credentials)
+    return build_service("people", "v1", credentials)
 
 
 def list_contacts(credentials: Any, max_results: int = 100):
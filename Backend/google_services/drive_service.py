@@ -2,7 +2,7 @@
 Google Drive Service
 Integrates with Drive API for file management
 """
-from googleapiclient.discovery import build
+from google_services.service_cache import build_service
 from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
 from typing import Any, Optional, Dict, List
 import io
@@ -10,7 +10,7 @@ import io
 
 def get_drive_service(credentials: Any):
     """Create Google Drive service instance"""
-    return build("drive", "v3", credentials=credentials)
+    return build_service("drive", "v3", credentials)
 
 
 def list_files(credentials: Any, max_results: int = 10, query: str = "", folder_id: Optional[str] = None):
@@ -2,7 +2,7 @@
 Gmail Service
 Integrates with Gmail API for reading and sending emails
 """
-from googleapiclient.discovery import build
+from google_services.service_cache import build_service
 from typing import Any
 import base64
 from email.mime.text import MIMEText
@@ -11,7 +11,7 @@ from email.mime.multipart import MIMEMultipart
 
 def get_gmail_service(credentials: Any):
     """Create Gmail service instance"""
-    return build("gmail", "v1", credentials=credentials)
+    return build_service("gmail", "v1", credentials)
 
 
 def list_messages(credentials: Any, max_results: int = 10, query: str = ""):
@@ -10,13 +10,13 @@ API Endpoints:
 
 Note: Google Keep API is primarily for enterprise use (Google Workspace)
 """
-from googleapiclient.discovery import build
+from google_services.service_cache import build_service
 from typing import Any, Optional, List
 
 
 def get_keep_service(credentials: Any):
     """Create Google Keep service instance"""
-    return build("keep", "v1", credentials=credentials)
+    return build_service("keep", "v1", credentials)
 
 
 # ============== NOTES ==============
@@ -1,25 +1,219 @@
-import requests
+import asyncio
+import hashlib
+import logging
+import re
+from typing import List
+from urllib.parse import quote, quote_plus
+import httpx
+import msgpack
+from cachetools import TTLCache
 from config import GOOGLE_MAPS_API_KEY
+from cache import cache_get, cache_set
+from serialization import loads
+from google_services.concurrency import RETRY_STATUSES, send_with_backoff
 
+logger = logging.getLogger(__name__)
 
-def geocode_address(address: str):
+GEOCODE_PATH = "/maps/api/geocode/json"
+
+# Maps is optional: without a key the app still starts and geocoding answers with this
+MISSING_KEY_RESPONSE = {
+    "error": "GOOGLE_MAPS_API_KEY not configured",
+    "status": "CONFIG_ERROR",
+    "help": "Add GOOGLE_MAPS_API_KEY to your .env file. Get a key from https://console.cloud.google.com/apis/credentials"
+}
+if not GOOGLE_MAPS_API_KEY:
+    logger.warning("GOOGLE_MAPS_API_KEY is not set; /maps endpoints will return CONFIG_ERROR")
+
+# Request URL up to the address, encoded once (only the address changes per call)
+_GEOCODE_URL_PREFIX = f"{GEOCODE_PATH}?key={quote(GOOGLE_MAPS_API_KEY or '', safe='')}&address="
+
+# Keep-alive HTTP/2 connections to maps.googleapis.com, shared by every request of this worker
+_client = httpx.AsyncClient(
+    base_url="https://maps.googleapis.com",
+    timeout=httpx.Timeout(10.0, connect=3.0),
+    transport=httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=3,  # connection failures only
+        # HTTP/2 multiplexes concurrent lookups over a few connections
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+    ),
+)
+
+# Normalized address -> msgpack-encoded geocoding result (venues are looked up over and over)
+# Only touched from the event loop, so no lock is needed
+GEOCODE_TTL = 24 * 60 * 60
+_geocode_cache = TTLCache(maxsize=10_000, ttl=GEOCODE_TTL)
+
+# Whether the negotiated protocol has been logged (once per worker)
+_protocol_logged = False
+
+# Normalized address -> lookup in progress
+_inflight = {}
+
+# Shared across workers/replicas when REDIS_URL is configured
+GEOCODE_REDIS_TTL = 48 * 60 * 60
+
+# Concurrent Geocoding API calls per batch (keeps bursts inside the QPS quota)
+BATCH_CONCURRENCY = 10
+
+# Only definitive answers are cached; quota and server errors must be retried
+CACHEABLE_STATUSES = ("OK", "ZERO_RESULTS")
+
+_WHITESPACE = re.compile(r"\s+")
+# "lat,lng" queries, which the Geocoding API also accepts as an address
+_COORDINATES = re.compile(r"^(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)$")
+
+
+def _normalize_address(address: str) -> str:
+    return _WHITESPACE.sub(" ", address.strip().lower())
+
+
+def _coordinate_key(lat: float, lng: float) -> str:
+    """Coordinates rounded to 3 decimals (~100 m), so nearby points share an entry"""
+    return f"{lat:.3f},{lng:.3f}"
+
+
+def _cache_key(address: str) -> str:
+    key = _normalize_address(address)
+    match = _COORDINATES.match(key)
+    if match:
+        return _coordinate_key(float(match.group(1)), float(match.group(2)))
+    return key
+
+
+def _alias_keys(result: dict) -> List[str]:
+    """Other keys a result is cached under: its canonical address and its rounded location"""
+    if not result.get("results"):
+        return []
+    top = result["results"][0]
+    keys = []
+    if top.get("formatted_address"):
+        keys.append(_normalize_address(top["formatted_address"]))
+    location = top.get("geometry", {}).get("location")
+    if location:
+        keys.append(_coordinate_key(location["lat"], location["lng"]))
+    return keys
+
+
+def _redis_key(address: str) -> str:
+    # v2: msgpack values (v1 held JSON)
+    return "geocode:v2:" + hashlib.sha1(address.encode()).hexdigest()
+
+
+def _should_retry(response: httpx.Response) -> bool:
+    # The Geocoding API reports rate limiting in the body of a 200 response
+    return response.status_code in RETRY_STATUSES or b'"OVER_QUERY_LIMIT"' in response.content
+
+
+def _error_response(status: str, message: str) -> dict:
+    """Failure in the Geocoding API's own response shape (never cached)"""
+    return {"results": [], "status": status, "error_message": message}
+
+
+async def _geocode_uncached(address: str):
+    """
+    Call the Geocoding API, backing off on rate limits and transient errors.
+    Failures that outlast the retries come back as a Geocoding-style error
+    rather than an exception, so one bad lookup can't fail a whole batch.
+    """
+    url = _GEOCODE_URL_PREFIX + quote_plus(address)
+    try:
+        response = await send_with_backoff(lambda: _client.get(url), _should_retry)
+    except httpx.TransportError as e:
+        logger.warning("Geocoding API request failed: %s", e)
+        return _error_response("UNKNOWN_ERROR", "Geocoding API unreachable")
+
+    global _protocol_logged
+    if not _protocol_logged:
+        _protocol_logged = True
+        logger.info("Geocoding API connection uses %s", response.http_version)
+
+    if response.status_code != 200:
+        logger.warning("Geocoding API returned HTTP %s", response.status_code)
+        status = "OVER_QUERY_LIMIT" if response.status_code == 429 else "UNKNOWN_ERROR"
+        return _error_response(status, f"Geocoding API returned HTTP {response.status_code}")
+    try:
+        return loads(response.content)
+    except ValueError:
+        logger.warning("Geocoding API returned a non-JSON body")
+        return _error_response("UNKNOWN_ERROR", "Geocoding API returned an invalid response")
+
+
+async def _lookup(key: str, address: str) -> bytes:
+    """
+    Shared cache, then the Geocoding API; fills both caches with definitive answers.
+    Returns the msgpack-encoded result, which every caller unpacks into its own copy.
+    """
+    # The Redis client is synchronous; keep it off the event loop
+    packed = await asyncio.to_thread(cache_get, _redis_key(key))
+    if packed is not None:
+        _geocode_cache[key] = packed
+        return packed
+
+    # Google gets what the caller asked for; the key (possibly rounded) only indexes the caches
+    result = await _geocode_uncached(address.strip())
+    packed = msgpack.packb(result, use_bin_type=True)
+    if result.get("status") not in CACHEABLE_STATUSES:
+        return packed
+    # Other spellings of the same place can now hit the cache
+    for alias in [key, *_alias_keys(result)]:
+        _geocode_cache[alias] = packed
+        await asyncio.to_thread(cache_set, _redis_key(alias), packed, GEOCODE_REDIS_TTL)
+    return packed
+
+
+async def geocode_address(address: str):
     """
     Geocode an address using Google Maps Geocoding API
-    
+
     Args:
         address: The address to geocode
-        
+
     Returns:
         Geocoding results with lat/lng coordinates
     """
     if not GOOGLE_MAPS_API_KEY:
-        return {
-            "error": "GOOGLE_MAPS_API_KEY not configured",
-            "status": "CONFIG_ERROR",
-            "help": "Add GOOGLE_MAPS_API_KEY to your .env file. Get a key from https://console.cloud.google.com/apis/credentials"
-        }
-    
-    url = "https://maps.googleapis.com/maps/api/geocode/json"
-    params = {"address": address, "key": GOOGLE_MAPS_API_KEY}
-    response = requests.get(url, params=params)
-    return response.json()
+        return dict(MISSING_KEY_RESPONSE)
+
+    key = _cache_key(address)
+    packed = _geocode_cache.get(key)
+    if packed is None:
+        # Concurrent misses for the same address share one lookup
+        lookup = _inflight.get(key)
+        if lookup is None:
+            lookup = asyncio.ensure_future(_lookup(key, address))
+            _inflight[key] = lookup
+            lookup.add_done_callback(lambda _: _inflight.pop(key, None))
+        # One caller disconnecting must not cancel the lookup for the others
+        packed = await asyncio.shield(lookup)
+    # Callers get their own copy, so mutating a result can't corrupt the cache
+    return msgpack.unpackb(packed, raw=False)
+
+
+async def geocode_addresses(addresses: List[str]) -> List[dict]:
+    """
+    Geocode several addresses concurrently
+
+    Args:
+        addresses: The addresses to geocode
+
+    Returns:
+        Geocoding results in the same order as the addresses
+    """
+    # Identical addresses share one lookup
+    unique = {_cache_key(a): a for a in addresses}
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def geocode_one(address: str):
+        async with semaphore:
+            return await geocode_address(address)
+
+    results = await asyncio.gather(*(geocode_one(a) for a in unique.values()))
+    by_key = dict(zip(unique, results))
+    return [by_key[_cache_key(a)] for a in addresses]
+
+
+async def close_maps_client():
+    """Close pooled Maps connections (on application shutdown)"""
+    await _client.aclose()
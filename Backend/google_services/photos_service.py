@@ -2,13 +2,13 @@
 Google Photos Service
 Integrates with Google Photos Library API
 """
-from googleapiclient.discovery import build
+from google_services.service_cache import build_service
 from typing import Any, Optional, List, Dict
 
 
 def get_photos_service(credentials: Any):
     """Create Google Photos service instance"""
-    return build("photoslibrary", "v1", credentials=credentials, static_discovery=False)
+    return build_service("photoslibrary", "v1", credentials, static_discovery=False)
 
 
 def list_albums(credentials: Any, page_size: int = 20, page_token: Optional[str] = None):
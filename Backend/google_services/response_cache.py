@@ -0,0 +1,105 @@
+"""
+Google API Response Cache
+Short-lived per-session caching of read-heavy Google API calls in Redis
+"""
+import asyncio
+import functools
+import time
+from typing import Callable, Optional
+import httpx
+from googleapiclient.errors import HttpError
+from cache import cache_hget, cache_hset, cache_delete
+from serialization import dumps, loads
+
+# Stale entries are kept this long to serve if Google is failing
+STALE_TTL = 24 * 60 * 60
+
+
+def _load_entry(key: str, name: str) -> Optional[dict]:
+    raw = cache_hget(key, name)
+    return loads(raw) if raw is not None else None
+
+
+def _store_entry(key: str, name: str, body):
+    cache_hset(key, name, dumps({"generated_at": time.time(), "body": body}), STALE_TTL)
+
+
+def _is_fresh(entry: Optional[dict], ttl: int) -> bool:
+    return entry is not None and time.time() - entry["generated_at"] < ttl
+
+
+def _is_server_error(error: Exception) -> bool:
+    if isinstance(error, HttpError):
+        return error.resp.status >= 500
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code >= 500
+
+
+def cached_response(namespace: str, ttl: int, field: Callable[..., str]):
+    """
+    Cache a function's JSON-serializable result per session for ttl seconds.
+    Entries live in one Redis hash per (namespace, session), field chosen by
+    field(*args, **kwargs). If the call fails with a Google 5xx, the last
+    (stale) result is returned instead. Calls without a session_id keyword
+    are not cached.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, session_id=None, **kwargs):
+            if not session_id:
+                return func(*args, **kwargs)
+            
+            key = f"{namespace}:{session_id}"
+            name = field(*args, **kwargs)
+            
+            entry = _load_entry(key, name)
+            if _is_fresh(entry, ttl):
+                return entry["body"]
+            
+            try:
+                body = func(*args, session_id=session_id, **kwargs)
+            except (HttpError, httpx.HTTPStatusError) as e:
+                if entry and _is_server_error(e):
+                    return entry["body"]
+                raise
+            
+            _store_entry(key, name, body)
+            return body
+        return wrapper
+    return decorator
+
+
+def cached_response_async(namespace: str, ttl: int, field: Callable[..., str]):
+    """
+    cached_response for coroutine functions. Shares the same Redis entries, so
+    sync and async variants of a call can use one namespace; the synchronous
+    Redis client is kept off the event loop.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, session_id=None, **kwargs):
+            if not session_id:
+                return await func(*args, **kwargs)
+            
+            key = f"{namespace}:{session_id}"
+            name = field(*args, **kwargs)
+            
+            entry = await asyncio.to_thread(_load_entry, key, name)
+            if _is_fresh(entry, ttl):
+                return entry["body"]
+            
+            try:
+                body = await func(*args, session_id=session_id, **kwargs)
+            except (HttpError, httpx.HTTPStatusError) as e:
+                if entry and _is_server_error(e):
+                    return entry["body"]
+                raise
+            
+            await asyncio.to_thread(_store_entry, key, name, body)
+            return body
+        return wrapper
+    return decorator
+
+
+def invalidate_responses(namespace: str, session_id: str):
+    """Drop every cached response of a namespace for a session (e.g. after a write)"""
+    cache_delete(f"{namespace}:{session_id}")
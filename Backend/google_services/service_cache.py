@@ -0,0 +1,107 @@
+"""
+Google API Service Cache
+Reuses built discovery clients per (session, api) instead of rebuilding them on every call
+"""
+import threading
+from typing import Any, Optional
+
+import google_auth_httplib2
+import httplib2
+from cachetools import TTLCache
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import build_http
+from google.oauth2.credentials import Credentials
+from serialization import loads
+
+# (session_id, api, version) -> (service, id(credentials))
+_services = TTLCache(maxsize=1024, ttl=1800)
+_lock = threading.Lock()
+_thread_local = threading.local()
+
+# (api, version) -> bundled discovery document, read from the package once per process
+_discovery_docs = {}
+
+
+def _thread_http() -> httplib2.Http:
+    """Keep-alive connections of the current worker thread, shared by every session and API"""
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        http = build_http()
+        _thread_local.http = http
+    return http
+
+
+class ThreadLocalHttp:
+    """
+    Authorized transport over the current thread's pooled connections.
+    httplib2.Http is not thread-safe, so each worker thread keeps its own
+    connections; they are reused across sessions and APIs so warm calls to
+    *.googleapis.com skip the TCP/TLS handshake.
+    """
+
+    def __init__(self, credentials: Credentials):
+        self.credentials = credentials
+
+    def request(self, *args, **kwargs):
+        return google_auth_httplib2.AuthorizedHttp(self.credentials, http=_thread_http()).request(*args, **kwargs)
+
+    def close(self):
+        """Connections are shared by the thread, so there is nothing to close per service"""
+
+
+def _static_discovery_doc(api: str, version: str) -> Optional[str]:
+    key = (api, version)
+    if key not in _discovery_docs:
+        _discovery_docs[key] = get_static_doc(api, version)
+    return _discovery_docs[key]
+
+
+def warm_up_discovery(*apis: tuple):
+    """Read the bundled discovery documents of the given (api, version) pairs ahead of first use"""
+    for api, version in apis:
+        _static_discovery_doc(api, version)
+
+
+def build_service(api: str, version: str, credentials: Credentials, static_discovery: bool = True):
+    """
+    Build a service on the pooled transport. By default the bundled discovery
+    document is used (no discovery RPC, no file cache); APIs that are not
+    bundled with the client library need static_discovery=False.
+    """
+    http = ThreadLocalHttp(credentials)
+    doc = _static_discovery_doc(api, version) if static_discovery else None
+    if doc is None:
+        return build(api, version, http=http, cache_discovery=False, static_discovery=static_discovery)
+    # build() would re-read the document from disk; a fresh parse per build keeps
+    # services independent (the client mutates the parsed document)
+    return build_from_document(loads(doc), http=http)
+
+
+def get_service(api: str, version: str, credentials: Credentials, session_id: Optional[str] = None) -> Any:
+    """
+    Get a service instance, reusing the one built for this session if possible.
+    The cached service is rebuilt when the session's credentials object changes
+    (e.g. reloaded from the database); in-place token refreshes are picked up
+    automatically since the transport holds the same credentials object.
+    """
+    if not session_id:
+        return build_service(api, version, credentials)
+
+    key = (session_id, api, version)
+    with _lock:
+        cached = _services.get(key)
+        if cached and cached[1] == id(credentials):
+            return cached[0]
+
+    service = build_service(api, version, credentials)
+    with _lock:
+        _services[key] = (service, id(credentials))
+    return service
+
+
+def invalidate_services(session_id: str):
+    """Drop every cached service for a session (e.g. on logout)"""
+    with _lock:
+        for key in [k for k in _services if k[0] == session_id]:
+            _services.pop(key, None)
@@ -2,13 +2,13 @@
 Google Sheets Service
 Integrates with Sheets API for spreadsheet operations
 """
-from googleapiclient.discovery import build
+from google_services.service_cache import build_service
 from typing import Any, List, Optional, Dict
 
 
 def get_sheets_service(credentials: Any):
     """Create Google Sheets service instance"""
-    return build("sheets", "v4", credentials=credentials)
+    return build_service("sheets", "v4", credentials)
 
 
 def get_spreadsheet(credentials: Any, spreadsheet_id: str):
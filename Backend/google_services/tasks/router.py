@@ -1,16 +1,18 @@
 """
 Google Tasks API Routes
 """
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Literal
 from googleapiclient.errors import HttpError
-from auth.router import get_credentials
-from auth.dependencies import require_session
+from auth.dependencies import CurrentCreds, SessionId
+from google_services.concurrency import run_for_user
 from google_services.tasks_service import (
     list_task_lists,
     list_tasks,
     create_task,
     complete_task,
+    complete_tasks,
     delete_task,
 )
 
@@ -18,71 +20,86 @@ router = APIRouter(prefix="/tasks", tags=["Tasks"])
 
 
 class TaskCreate(BaseModel):
-    title: str
+    model_config = ConfigDict(str_strip_whitespace=True, extra="forbid")
+    
+    title: str = Field(..., min_length=1, max_length=200)
     notes: str = ""
     task_list_id: str = "@default"
+    status: Literal["needsAction", "completed"] = "needsAction"
+
+
+class BulkComplete(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True, extra="forbid")
+    
+    task_ids: List[str] = Field(..., min_length=1, max_length=500)
+    task_list_id: str = "@default"
 
 
 @router.get("/lists")
-def get_task_lists(session_id: str = Depends(require_session)):
+async def get_task_lists(credentials: CurrentCreds, session_id: SessionId):
     """Get all task lists"""
-    credentials = get_credentials(session_id)
-    if not credentials:
-        raise HTTPException(status_code=401, detail="User not authenticated. Visit /auth/login first.")
     try:
-        return list_task_lists(credentials)
+        return await run_for_user(session_id, list_task_lists, credentials, session_id=session_id)
     except HttpError as e:
         raise HTTPException(status_code=e.resp.status, detail=str(e))
 
 
 @router.get("/")
-def get_tasks(task_list_id: str = "@default", session_id: str = Depends(require_session)):
+async def get_tasks(credentials: CurrentCreds, session_id: SessionId, task_list_id: str = "@default"):
     """Get all tasks in a task list"""
-    credentials = get_credentials(session_id)
-    if not credentials:
-        raise HTTPException(status_code=401, detail="User not authenticated. Visit /auth/login first.")
     try:
-        return list_tasks(credentials, task_list_id)
+        return await run_for_user(session_id, list_tasks, credentials, task_list_id, session_id=session_id)
     except HttpError as e:
         raise HTTPException(status_code=e.resp.status, detail=str(e))
 
 
 @router.post("/")
-def add_task(task: TaskCreate, session_id: str = Depends(require_session)):
+async def add_task(task: TaskCreate, credentials: CurrentCreds, session_id: SessionId):
     """Create a new task"""
-    credentials = get_credentials(session_id)
-    if not credentials:
-        raise HTTPException(status_code=401, detail="User not authenticated. Visit /auth/login first.")
     try:
-        return create_task(
+        return await run_for_user(
+            session_id,
+            create_task,
             credentials,
             title=task.title,
             notes=task.notes,
-            task_list_id=task.task_list_id
+            task_list_id=task.task_list_id,
+            status=task.status,
+            session_id=session_id,
         )
     except HttpError as e:
         raise HTTPException(status_code=e.resp.status, detail=str(e))
 
 
 @router.put("/{task_id}/complete")
-def mark_complete(task_id: str, task_list_id: str = "@default", session_id: str = Depends(require_session)):
+async def mark_complete(task_id: str, credentials: CurrentCreds, session_id: SessionId, task_list_id: str = "@default"):
     """Mark a task as completed"""
-    credentials = get_credentials(session_id)
-    if not credentials:
-        raise HTTPException(status_code=401, detail="User not authenticated. Visit /auth/login first.")
     try:
-        return complete_task(credentials, task_id, task_list_id)
+        return await run_for_user(session_id, complete_task, credentials, task_id, task_list_id, session_id=session_id)
+    except HttpError as e:
+        raise HTTPException(status_code=e.resp.status, detail=str(e))
+
+
+@router.post("/bulk-complete")
+async def bulk_complete(request: BulkComplete, credentials: CurrentCreds, session_id: SessionId):
+    """Mark several tasks as completed in batched requests"""
+    try:
+        return await run_for_user(
+            session_id,
+            complete_tasks,
+            credentials,
+            request.task_ids,
+            request.task_list_id,
+            session_id=session_id,
+        )
     except HttpError as e:
         raise HTTPException(status_code=e.resp.status, detail=str(e))
 
 
 @router.delete("/{task_id}")
-def remove_task(task_id: str, task_list_id: str = "@default", session_id: str = Depends(require_session)):
+async def remove_task(task_id: str, credentials: CurrentCreds, session_id: SessionId, task_list_id: str = "@default"):
     """Delete a task"""
-    credentials = get_credentials(session_id)
-    if not credentials:
-        raise HTTPException(status_code=401, detail="User not authenticated. Visit /auth/login first.")
     try:
-        return delete_task(credentials, task_id, task_list_id)
+        return await run_for_user(session_id, delete_task, credentials, task_id, task_list_id, session_id=session_id)
     except HttpError as e:
         raise HTTPException(status_code=e.resp.status, detail=str(e))
@@ -2,55 +2,125 @@
 Google Tasks Service
 Integrates with Google Tasks API
 """
-from googleapiclient.discovery import build
+from typing import List, Optional
 from google.oauth2.credentials import Credentials
+from google_services.service_cache import get_service
+from google_services.response_cache import cached_response, invalidate_responses
 
+# Max requests per batch call (Google allows up to 100, smaller batches are kinder to quotas)
+BATCH_SIZE = 50
 
-def get_tasks_service(credentials: Credentials):
-    """Create Google Tasks service instance"""
-    return build("tasks", "v1", credentials=credentials)
 
+def get_tasks_service(credentials: Credentials, session_id: Optional[str] = None):
+    """Get Google Tasks service instance (cached per session)"""
+    return get_service("tasks", "v1", credentials, session_id)
 
-def list_task_lists(credentials: Credentials):
+
+@cached_response("tasks", ttl=60, field=lambda credentials: "lists")
+def list_task_lists(credentials: Credentials, session_id: Optional[str] = None):
     """List all task lists for the user"""
-    service = get_tasks_service(credentials)
+    service = get_tasks_service(credentials, session_id)
     results = service.tasklists().list(maxResults=10).execute()
     return results.get("items", [])
 
 
-def list_tasks(credentials: Credentials, task_list_id: str = "@default"):
+@cached_response("tasks", ttl=15, field=lambda credentials, task_list_id="@default": f"list:{task_list_id}")
+def list_tasks(credentials: Credentials, task_list_id: str = "@default", session_id: Optional[str] = None):
     """List all tasks in a task list"""
-    service = get_tasks_service(credentials)
+    service = get_tasks_service(credentials, session_id)
     results = service.tasks().list(tasklist=task_list_id).execute()
     return results.get("items", [])
 
 
-def create_task(credentials: Credentials, title: str, notes: str = "", task_list_id: str = "@default"):
+def create_task(
+    credentials: Credentials,
+    title: str,
+    notes: str = "",
+    task_list_id: str = "@default",
+    status: str = "needsAction",
+    session_id: Optional[str] = None,
+):
     """Create a new task"""
-    service = get_tasks_service(credentials)
+    service = get_tasks_service(credentials, session_id)
     
     task = {
         "title": title,
         "notes": notes,
+        "status": status,
     }
     
     result = service.tasks().insert(tasklist=task_list_id, body=task).execute()
+    if session_id:
+        invalidate_responses("tasks", session_id)
     return result
 
 
-def complete_task(credentials: Credentials, task_id: str, task_list_id: str = "@default"):
+def complete_task(
+    credentials: Credentials,
+    task_id: str,
+    task_list_id: str = "@default",
+    session_id: Optional[str] = None,
+):
     """Mark a task as completed"""
-    service = get_tasks_service(credentials)
-    
-    task = service.tasks().get(tasklist=task_list_id, task=task_id).execute()
-    task["status"] = "completed"
+    service = get_tasks_service(credentials, session_id)
     
-    result = service.tasks().update(tasklist=task_list_id, task=task_id, body=task).execute()
+    # PATCH only the status - no need to fetch the full task first
+    result = service.tasks().patch(
+        tasklist=task_list_id,
+        task=task_id,
+        body={"status": "completed"},
+    ).execute()
+    if session_id:
+        invalidate_responses("tasks", session_id)
     return result
 
 
-def delete_task(credentials: Credentials, task_id: str, task_list_id: str = "@default"):
+def complete_tasks(
+    credentials: Credentials,
+    task_ids: List[str],
+    task_list_id: str = "@default",
+    session_id: Optional[str] = None,
+):
+    """Mark several tasks as completed using batch requests (one HTTP call per chunk)"""
+    service = get_tasks_service(credentials, session_id)
+    task_ids = list(dict.fromkeys(task_ids))  # batch request ids must be unique
+    
+    completed = []
+    failed = []
+    
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            failed.append({"task_id": request_id, "error": str(exception)})
+        else:
+            completed.append(response)
+    
+    for start in range(0, len(task_ids), BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=on_response)
+        for task_id in task_ids[start:start + BATCH_SIZE]:
+            batch.add(
+                service.tasks().patch(
+                    tasklist=task_list_id,
+                    task=task_id,
+                    body={"status": "completed"},
+                ),
+                request_id=task_id,
+            )
+        batch.execute()
+    
+    if session_id:
+        invalidate_responses("tasks", session_id)
+    return {"completed": completed, "failed": failed}
+
+
+def delete_task(
+    credentials: Credentials,
+    task_id: str,
+    task_list_id: str = "@default",
+    session_id: Optional[str] = None,
+):
     """Delete a task"""
-    service = get_tasks_service(credentials)
+    service = get_tasks_service(credentials, session_id)
     service.tasks().delete(tasklist=task_list_id, task=task_id).execute()
+    if session_id:
+        invalidate_responses("tasks", session_id)
     return {"message": "Task deleted successfully"}
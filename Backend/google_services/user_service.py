@@ -2,13 +2,13 @@
 Google User Profile Service
 Get user information from Google
 """
-from googleapiclient.discovery import build
+from google_services.service_cache import build_service
 from google.oauth2.credentials import Credentials
 
 
 def get_user_service(credentials: Credentials):
     """Create Google OAuth2 service instance"""
-    return build("oauth2", "v2", credentials=credentials)
+    return build_service("oauth2", "v2", credentials)
 
 
 def get_user_info(credentials: Credentials):
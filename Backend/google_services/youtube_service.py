@@ -2,13 +2,13 @@
 YouTube Service
 Integrates with YouTube Data API v3
 """
-from googleapiclient.discovery import build
+from google_services.service_cache import build_service
 from typing import Any, Optional
 
 
 def get_youtube_service(credentials: Any):
     """Create YouTube service instance"""
-    return build("youtube", "v3", credentials=credentials)
+    return build_service("youtube", "v3", credentials)
 
 
 def search_videos(credentials: Any, query: str, max_results: int = 10, order: str = "relevance"):
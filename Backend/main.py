@@ -1,6 +1,10 @@
 from fastapi import FastAPI, HTTPException, Query, Depends, Cookie
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import logging
 import os
 from auth.router import router as auth_router, get_credentials
 from auth.dependencies import require_session
@@ -12,9 +16,49 @@ from google_services.contacts.router import router as contacts_router
 from google_services.sheets.router import router as sheets_router
 from google_services.youtube.router import router as youtube_router
 from google_services.photos.router import router as photos_router
-from google_services.maps import geocode_address
+from google_services.calendar_service import close_calendar_client
+from google_services.maps import geocode_address, geocode_addresses, close_maps_client
 from google_services.user_service import get_user_info
-from smart_assistant import get_smart_summary
+from google_services.service_cache import warm_up_discovery
+from serialization import ORJSONResponse
+from smart_assistant import (
+    get_smart_summary,
+    build_summary_prompt,
+    stream_smart_summary,
+    get_gemini_client,
+    get_summary_config,
+)
+
+
+# Unbuffered, timestamped logs (print output may sit in a buffer until a serverless invocation ends)
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def warm_up_gemini():
+    """Import google.genai and create the Gemini client ahead of the first smart summary"""
+    try:
+        get_gemini_client()
+        get_summary_config()
+    except Exception as e:
+        logger.warning("Gemini warm-up failed: %s", e)
+
+
+def warm_up():
+    """Load what the first requests of a worker would otherwise load inline"""
+    warm_up_discovery(("calendar", "v3"), ("tasks", "v1"), ("gmail", "v1"), ("oauth2", "v2"))
+    warm_up_gemini()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up clients in the background once the worker starts, without delaying startup"""
+    warmup = asyncio.create_task(asyncio.to_thread(warm_up))
+    yield
+    warmup.cancel()
+    await close_maps_client()
+    await close_calendar_client()
+
 
 app = FastAPI(
     title="Google Services API",
@@ -36,8 +80,11 @@ app = FastAPI(
     
     ## 🧠 NEW: Smart Assistant
     - `/smart-summary` - Get AI analysis of all your events & tasks with prioritized recommendations
+    - `/smart-summary/stream` - Same analysis, streamed as it is generated
     """,
-    version="2.2.0"
+    version="2.2.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Get allowed origins from environment
@@ -104,7 +151,7 @@ handler = app
 
 
 @app.get("/smart-summary", tags=["🧠 Smart Assistant"])
-def smart_summary(
+async def smart_summary(
     context: Optional[str] = Query(
         None, 
         description="Optional context like 'Focus on work tasks' or 'I have a deadline tomorrow'"
@@ -124,7 +171,38 @@ def smart_summary(
     **Optional**: Add `context` parameter to personalize.
     Example: `/smart-summary?context=I need to focus on the client project`
     """
-    credentials = get_credentials(session_id)
+    credentials = await asyncio.to_thread(get_credentials, session_id)
+    
+    if not credentials:
+        raise HTTPException(
+            status_code=401, 
+            detail={
+                "error": "Not authenticated",
+                "action": "Visit /auth/login to connect your Google account"
+            }
+        )
+    
+    try:
+        return await get_smart_summary(credentials, user_context=context, session_id=session_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/smart-summary/stream", tags=["🧠 Smart Assistant"])
+async def smart_summary_stream(
+    context: Optional[str] = Query(
+        None, 
+        description="Optional context like 'Focus on work tasks' or 'I have a deadline tomorrow'"
+    ),
+    session_id: str = Depends(require_session)
+):
+    """
+    🧠 **Stream the AI-Powered Smart Summary**
+    
+    Same analysis as `/smart-summary`, streamed as markdown text while
+    Gemini generates it so the frontend can render it as it arrives.
+    """
+    credentials = await asyncio.to_thread(get_credentials, session_id)
     
     if not credentials:
         raise HTTPException(
@@ -135,10 +213,13 @@ def smart_summary(
             }
         )
     
+    # Fetch Google data before streaming so failures still return a proper error status
     try:
-        return get_smart_summary(credentials, user_context=context)
+        prompt, events = await build_summary_prompt(credentials, user_context=context, session_id=session_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    return StreamingResponse(stream_smart_summary(prompt, events), media_type="text/markdown; charset=utf-8")
 
 
 @app.get("/user/me", tags=["User"])
@@ -151,6 +232,12 @@ def get_current_user(session_id: str = Depends(require_session)):
 
 
 @app.get("/maps/geocode", tags=["Maps"])
-def geocode(address: str):
+async def geocode(address: str):
     """Geocode an address using Google Maps API"""
-    return geocode_address(address)
+    return await geocode_address(address)
+
+
+@app.get("/maps/geocode/batch", tags=["Maps"])
+async def geocode_batch(address: List[str] = Query(..., min_length=1, max_length=50)):
+    """Geocode several addresses at once (?address=...&address=...), results in request order"""
+    return await geocode_addresses(address)
@@ -0,0 +1,26 @@
+"""
+Serialization helpers
+Fast JSON encoding with orjson for cached values and API responses
+"""
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse
+
+_DUMPS_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to JSON bytes (naive datetimes are treated as UTC)"""
+    return orjson.dumps(obj, option=_DUMPS_OPTIONS)
+
+
+def loads(data) -> Any:
+    """Deserialize JSON from bytes or str"""
+    return orjson.loads(data)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -3,18 +3,92 @@ Smart Assistant Service
 Single endpoint that aggregates Google Calendar, Tasks & Gmail data 
 and uses Gemini AI to provide intelligent task management advice
 """
-from google import genai
-from google.genai import types
-from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
 from datetime import datetime, timedelta
+from functools import lru_cache
 from dateutil import parser as date_parser
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
 from config import GEMINI_API_KEY
+from google_services.service_cache import get_service
+from google_services.response_cache import cached_response
+from google_services.calendar_service import EVENTS_CACHE_TTL
+from google_services.concurrency import run_for_user
+import asyncio
 import base64
 
-# Configure Gemini client
-gemini_client = genai.Client(api_key=GEMINI_API_KEY)
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# Gemini system instruction - kept concise to reduce token usage
+SYSTEM_INSTRUCTION = """You are a productivity assistant. Be VERY concise.
+
+Provide output in this exact format:
+
+**📧 EMAILS** (max 5 items)
+• [Sender]: [Action needed] - [Urgent/Normal]
+
+**📅 MEETINGS** (max 5 items)
+• [Time] - [Event name] - [Duration]
+
+**✅ TASKS** (max 5 items)
+• [Task] - [Due date if any]
+
+**⚡ TOP 3 PRIORITIES**
+1. [Most important action]
+2. [Second priority]
+3. [Third priority]
+
+**🗓️ DAY PLAN**
+• Morning: [Focus work/meetings]
+• Afternoon: [Key activities]
+• Best time for deep work: [Suggested slot]
+
+Rules:
+- One line per item, no extra explanation
+- Skip sections if empty
+- Suggest time blocks around meetings
+- Max 180 words total"""
+
+
+@lru_cache(maxsize=1)
+def get_gemini_client():
+    """Create the Gemini client on first use, keeping google.genai off the cold-start path"""
+    from google import genai
+    return genai.Client(api_key=GEMINI_API_KEY)
+
+
+@lru_cache(maxsize=1)
+def get_summary_config():
+    """Gemini generation config for the smart summary"""
+    from google.genai import types
+    return types.GenerateContentConfig(system_instruction=SYSTEM_INSTRUCTION)
+
+
+# Email bodies are truncated to this many characters to avoid token limits
+MAX_BODY_CHARS = 500
+_b64decode = base64.urlsafe_b64decode
+
+# Task-related keywords for unread emails likely containing pending work or client requests
+TASK_KEYWORDS = (
+    "action required",
+    "pending",
+    "deadline",
+    "urgent",
+    "please review",
+    "waiting for",
+    "follow up",
+    "task",
+    "request",
+    "asap",
+    "due date",
+    "by tomorrow",
+    "needs your",
+    "reminder",
+    "priority",
+    "important",
+)
+
+# Gmail search query: is:unread AND (keyword1 OR keyword2 OR ...)
+UNREAD_TASK_EMAILS_QUERY = "is:unread (" + " OR ".join(f'"{kw}"' for kw in TASK_KEYWORDS) + ")"
 
 
 def find_overlapping_events(events: List[Dict]) -> List[str]:
@@ -35,9 +109,14 @@ def find_overlapping_events(events: List[Dict]) -> List[str]:
     return overlaps
 
 
-def get_all_events(credentials: Credentials, days_ahead: int = 15) -> List[Dict[str, Any]]:
+@cached_response("events", ttl=EVENTS_CACHE_TTL, field=lambda credentials, days_ahead=15: f"days:{days_ahead}")
+def get_all_events(
+    credentials: Credentials,
+    days_ahead: int = 15,
+    session_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
     """Fetch all calendar events for the next N days (default 15)"""
-    service = build("calendar", "v3", credentials=credentials)
+    service = get_service("calendar", "v3", credentials, session_id)
     
     now = datetime.utcnow()
     time_min = now.isoformat() + "Z"
@@ -50,109 +129,144 @@ def get_all_events(credentials: Credentials, days_ahead: int = 15) -> List[Dict[
         maxResults=50,
         singleEvents=True,
         orderBy="startTime",
+        fields="items(summary, start, end)",  # all the summary and overlap check use
     ).execute()
     
     return events.get("items", [])
 
 
-def get_all_tasks(credentials: Credentials) -> List[Dict[str, Any]]:
+def get_all_tasks(credentials: Credentials, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
     """Fetch all pending tasks from all task lists"""
-    service = build("tasks", "v1", credentials=credentials)
+    service = get_service("tasks", "v1", credentials, session_id)
     
     all_tasks = []
     
     # Get all task lists
-    task_lists = service.tasklists().list(maxResults=10).execute()
+    task_lists = service.tasklists().list(maxResults=10).execute().get("items", [])
+    if not task_lists:
+        return all_tasks
+    
+    responses = {}
+    
+    def collect(request_id, response, exception):
+        if exception is not None:
+            raise exception
+        responses[request_id] = response
+    
+    # Get tasks from every list in a single batched HTTP call
+    batch = service.new_batch_http_request(callback=collect)
+    for task_list in task_lists:
+        batch.add(
+            service.tasks().list(
+                tasklist=task_list.get("id"),
+                showCompleted=False,
+                maxResults=100
+            ),
+            request_id=task_list.get("id"),
+        )
+    batch.execute()
     
-    for task_list in task_lists.get("items", []):
-        list_id = task_list.get("id")
+    for task_list in task_lists:
         list_name = task_list.get("title", "Unknown List")
-        
-        # Get tasks from this list
-        tasks = service.tasks().list(
-            tasklist=list_id,
-            showCompleted=False,
-            maxResults=100
-        ).execute()
-        
-        for task in tasks.get("items", []):
+        for task in responses.get(task_list.get("id"), {}).get("items", []):
             task["listName"] = list_name
             all_tasks.append(task)
     
     return all_tasks
 
 
-def get_unread_emails(credentials: Credentials, max_results: int = 10) -> List[Dict[str, Any]]:
+def batch_get_messages(service, message_ids: List[str], **params) -> Dict[str, Dict[str, Any]]:
+    """Fetch several Gmail messages in a single batched HTTP call, keyed by message ID"""
+    details = {}
+    
+    def collect(request_id, response, exception):
+        if exception is None:
+            details[request_id] = response
+    
+    batch = service.new_batch_http_request(callback=collect)
+    for message_id in message_ids:
+        batch.add(
+            service.users().messages().get(userId="me", id=message_id, **params),
+            request_id=message_id,
+        )
+    batch.execute()
+    
+    return details
+
+
+def decode_body_head(data: str, max_chars: int = MAX_BODY_CHARS) -> str:
+    """Decode only the leading base64 needed for max_chars characters of a message body"""
+    # Up to 4 UTF-8 bytes per character, 4 base64 characters per 3 bytes
+    head = data[:(max_chars * 4 + 2) // 3 * 4]
+    head += "=" * (-len(head) % 4)
+    return _b64decode(head).decode("utf-8", errors="ignore")[:max_chars]
+
+
+def extract_plain_text(payload: Dict[str, Any]) -> str:
+    """Extract the start of the text/plain body from a Gmail message payload"""
+    if "parts" in payload:
+        part = next((p for p in payload["parts"] if p.get("mimeType") == "text/plain"), None)
+        data = part.get("body", {}).get("data", "") if part else ""
+    else:
+        data = payload.get("body", {}).get("data", "")
+    
+    return decode_body_head(data) if data else ""
+
+
+def get_unread_emails(
+    credentials: Credentials,
+    max_results: int = 10,
+    session_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
     """Fetch unread emails that contain tasks, action items, or pending work from clients"""
-    service = build("gmail", "v1", credentials=credentials)
-    
-    # Query for unread emails with task-related keywords
-    # Filters for emails likely containing pending tasks or client requests
-    task_keywords = [
-        "action required",
-        "pending",
-        "deadline",
-        "urgent",
-        "please review",
-        "waiting for",
-        "follow up",
-        "task",
-        "request",
-        "asap",
-        "due date",
-        "by tomorrow",
-        "needs your",
-        "reminder",
-        "priority",
-        "important"
-    ]
-    
-    # Build Gmail search query: is:unread AND (keyword1 OR keyword2 OR ...)
-    keywords_query = " OR ".join([f'"{kw}"' for kw in task_keywords])
-    search_query = f"is:unread ({keywords_query})"
+    service = get_service("gmail", "v1", credentials, session_id)
     
     results = service.users().messages().list(
         userId="me",
         maxResults=max_results,
-        q=search_query
+        q=UNREAD_TASK_EMAILS_QUERY
     ).execute()
     
     messages = results.get("messages", [])
+    if not messages:
+        return []
+    
+    message_ids = [msg["id"] for msg in messages]
+    
+    # First pass: headers + snippet only, skips downloading the MIME tree
+    details = batch_get_messages(
+        service,
+        message_ids,
+        format="metadata",
+        metadataHeaders=["From", "Subject", "Date"],
+    )
+    
+    # Second pass: full payload only for messages without a usable snippet
+    needs_body = [msg_id for msg_id in message_ids if msg_id in details and not details[msg_id].get("snippet")]
+    full_details = batch_get_messages(service, needs_body, format="full") if needs_body else {}
     
     detailed_emails = []
-    for msg in messages:
+    for msg_id in message_ids:
+        msg_detail = details.get(msg_id)
+        if msg_detail is None:
+            continue
         try:
-            msg_detail = service.users().messages().get(
-                userId="me",
-                id=msg["id"],
-                format="full"
-            ).execute()
+            get_header = {h["name"]: h["value"] for h in msg_detail.get("payload", {}).get("headers", [])}.get
+            snippet = msg_detail.get("snippet", "")
             
-            headers = {h["name"]: h["value"] for h in msg_detail.get("payload", {}).get("headers", [])}
-            
-            # Extract body content
-            body = ""
-            payload = msg_detail.get("payload", {})
-            
-            if "parts" in payload:
-                for part in payload["parts"]:
-                    if part.get("mimeType") == "text/plain":
-                        data = part.get("body", {}).get("data", "")
-                        if data:
-                            body = base64.urlsafe_b64decode(data).decode("utf-8")
-                        break
-            elif "body" in payload and "data" in payload["body"]:
-                body = base64.urlsafe_b64decode(payload["body"]["data"]).decode("utf-8")
+            # Body falls back to the snippet unless the full message was fetched
+            full_detail = full_details.get(msg_id)
+            body = extract_plain_text(full_detail.get("payload", {})) if full_detail else snippet
             
             # Truncate body to avoid token limits
-            body = body[:500] if len(body) > 500 else body
+            body = body[:MAX_BODY_CHARS]
             
             detailed_emails.append({
-                "id": msg["id"],
-                "from": headers.get("From", "Unknown"),
-                "subject": headers.get("Subject", "No Subject"),
-                "date": headers.get("Date", ""),
-                "snippet": msg_detail.get("snippet", ""),
+                "id": msg_id,
+                "from": get_header("From", "Unknown"),
+                "subject": get_header("Subject", "No Subject"),
+                "date": get_header("Date", ""),
+                "snippet": snippet,
                 "body": body
             })
         except Exception:
@@ -164,87 +278,53 @@ def get_unread_emails(credentials: Credentials, max_results: int = 10) -> List[D
 def format_schedule_data(events: List[Dict], tasks: List[Dict], emails: List[Dict]) -> str:
     """Format events, tasks, and emails concisely for Gemini"""
     
-    output = "EVENTS:\n"
+    parts = ["EVENTS:\n"]
     if events:
         for event in events[:10]:  # Limit to 10 events
             summary = event.get('summary', 'Untitled')
-            start = event.get('start', {}).get('dateTime', event.get('start', {}).get('date', 'TBD'))
-            output += f"- {summary} | {start}\n"
+            start = event.get('start', {})
+            parts.append(f"- {summary} | {start.get('dateTime', start.get('date', 'TBD'))}\n")
     else:
-        output += "None\n"
+        parts.append("None\n")
     
-    output += "\nTASKS:\n"
+    parts.append("\nTASKS:\n")
     if tasks:
         for task in tasks[:10]:  # Limit to 10 tasks
             title = task.get('title', 'Untitled')
             due = task.get('due', 'No due date')
-            output += f"- {title} | Due: {due}\n"
+            parts.append(f"- {title} | Due: {due}\n")
     else:
-        output += "None\n"
+        parts.append("None\n")
     
-    output += "\nEMAILS:\n"
+    parts.append("\nEMAILS:\n")
     if emails:
         for email in emails[:10]:  # Limit to 10 emails
             sender = email.get('from', 'Unknown')[:30]
             subject = email.get('subject', 'No Subject')[:50]
-            output += f"- {sender}: {subject}\n"
+            parts.append(f"- {sender}: {subject}\n")
     else:
-        output += "None\n"
+        parts.append("None\n")
     
-    return output
+    return "".join(parts)
 
 
-def get_smart_summary(credentials: Credentials, user_context: Optional[str] = None) -> Dict[str, Any]:
-    """
-    Main function: Fetches all events, tasks & unread emails, then uses Gemini to provide
-    intelligent summary and task management recommendations.
+async def build_summary_prompt(
+    credentials: Credentials,
+    user_context: Optional[str] = None,
+    session_id: Optional[str] = None,
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """Fetch all events, tasks & unread emails and build the Gemini prompt (returns prompt, events)"""
     
-    Returns a structured response with:
-    - Raw data (events, tasks, emails)
-    - AI-generated summary
-    - Prioritized task order
-    - Email-based action items
-    - Productivity recommendations
-    """
-    
-    # Fetch all data from Google services
-    events = get_all_events(credentials)
-    tasks = get_all_tasks(credentials)
-    emails = get_unread_emails(credentials)
+    # Fetch all data from Google services concurrently
+    events, tasks, emails = await asyncio.gather(
+        run_for_user(session_id, get_all_events, credentials, session_id=session_id),
+        run_for_user(session_id, get_all_tasks, credentials, session_id=session_id),
+        run_for_user(session_id, get_unread_emails, credentials, session_id=session_id),
+    )
     
     # Format data for Gemini
     schedule_data = format_schedule_data(events, tasks, emails)
     
-    # Gemini system instruction - kept concise to reduce token usage
-    system_instruction = """You are a productivity assistant. Be VERY concise.
-
-Provide output in this exact format:
-
-**📧 EMAILS** (max 5 items)
-• [Sender]: [Action needed] - [Urgent/Normal]
-
-**📅 MEETINGS** (max 5 items)
-• [Time] - [Event name] - [Duration]
-
-**✅ TASKS** (max 5 items)
-• [Task] - [Due date if any]
-
-**⚡ TOP 3 PRIORITIES**
-1. [Most important action]
-2. [Second priority]
-3. [Third priority]
-
-**🗓️ DAY PLAN**
-• Morning: [Focus work/meetings]
-• Afternoon: [Key activities]
-• Best time for deep work: [Suggested slot]
-
-Rules:
-- One line per item, no extra explanation
-- Skip sections if empty
-- Suggest time blocks around meetings
-- Max 180 words total"""
-
     # Build the prompt - kept minimal
     prompt = f"""Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}
 
@@ -253,24 +333,65 @@ Rules:
     if user_context:
         prompt += f"\nContext: {user_context}"
     
-    # Generate AI response
-    config = types.GenerateContentConfig(system_instruction=system_instruction)
+    return prompt, events
+
+
+def overlap_warning(events: List[Dict[str, Any]]) -> str:
+    """Warning appended to the AI analysis when events overlap"""
+    overlaps = find_overlapping_events(events)
+    if overlaps:
+        return f"\n\n⚠️ **Overlapping events:** {', '.join(overlaps)}"
+    return ""
+
+
+async def get_smart_summary(
+    credentials: Credentials,
+    user_context: Optional[str] = None,
+    session_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Main function: Fetches all events, tasks & unread emails, then uses Gemini to provide
+    intelligent summary and task management recommendations.
+    
+    Returns a structured response with:
+    - Raw data (events, tasks, emails)
+    - AI-generated summary
+    - Prioritized task order
+    - Email-based action items
+    - Productivity recommendations
+    """
+    prompt, events = await build_summary_prompt(credentials, user_context, session_id)
     
-    response = gemini_client.models.generate_content(
-        model="gemini-2.5-flash",
+    # Generate AI response
+    response = await get_gemini_client().aio.models.generate_content(
+        model=GEMINI_MODEL,
         contents=prompt,
-        config=config
+        config=get_summary_config()
     )
     
     ai_summary = response.text or "Unable to generate summary."
     
     # Add overlap warning if any
-    overlaps = find_overlapping_events(events)
-    if overlaps:
-        ai_summary += f"\n\n⚠️ **Overlapping events:** {', '.join(overlaps)}"
+    ai_summary += overlap_warning(events)
     
     return {
         "success": True,
         "generated_at": datetime.now().isoformat(),
         "ai_analysis": ai_summary
     }
+
+
+async def stream_smart_summary(prompt: str, events: List[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Stream the AI analysis for a prompt from build_summary_prompt as Gemini generates it"""
+    stream = await get_gemini_client().aio.models.generate_content_stream(
+        model=GEMINI_MODEL,
+        contents=prompt,
+        config=get_summary_config()
+    )
+    async for chunk in stream:
+        if chunk.text:
+            yield chunk.text
+    
+    warning = overlap_warning(events)
+    if warning:
+        yield warning